@@ -1,44 +1,128 @@
+import hashlib
+import io
+import multiprocessing
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqUtils import gc_fraction
 import plotly.graph_objects as go
 from src.utils.sequence_tools import (
-    find_pam_sites, 
+    encode_sequence,
+    base_counts,
+    is_valid_dna,
+    rna_and_complement,
+    candidate_base_pairs,
+    count_base_pairs,
+    revcomp,
+    find_pam_sites_np,
     design_grnas, 
+    design_batch_item,
+    grnas_to_frame,
     display_grna_results,
     predict_grna_efficiency,
     check_off_targets,
     analyze_secondary_structure,
     create_sequence_plot
 )
+from src.utils.scoring_algorithms import CRISPRScoring
 
-# Add color coding functions at the top level
-def color_efficiency(val):
-    """Color code efficiency scores"""
-    try:
-        num_val = float(val.strip('%'))/100 if isinstance(val, str) else val
-        if num_val >= 0.7:
-            return 'background-color: #90EE90'  # Light green
-        elif num_val >= 0.5:
-            return 'background-color: #FFFFE0'  # Light yellow
-        return 'background-color: #FFB6C1'      # Light red
-    except:
-        return ''
+# Batches with fewer bases than this run serially; below it the cost of
+# spawning worker processes outweighs the parallel speedup
+PARALLEL_MIN_BASES = 200_000
 
-def color_offtarget(val):
-    """Color code off-target scores"""
-    try:
-        num_val = float(val) if isinstance(val, str) else val
-        if num_val <= 20:
-            return 'background-color: #90EE90'  # Light green
-        elif num_val <= 50:
-            return 'background-color: #FFFFE0'  # Light yellow
-        return 'background-color: #FFB6C1'      # Light red
-    except:
-        return ''
+# Add color coding functions at the top level (applied per column via Styler.apply)
+def efficiency_colors(col):
+    """Color code a column of efficiency scores"""
+    col = pd.to_numeric(col, errors='coerce')
+    return np.select(
+        [col >= 0.7, col >= 0.5, col < 0.5],
+        ['background-color: #90EE90',   # Light green
+         'background-color: #FFFFE0',   # Light yellow
+         'background-color: #FFB6C1'],  # Light red
+        default=''
+    )
+
+def offtarget_colors(col):
+    """Color code a column of off-target scores"""
+    col = pd.to_numeric(col, errors='coerce')
+    return np.select(
+        [col <= 20, col <= 50, col > 50],
+        ['background-color: #90EE90',   # Light green
+         'background-color: #FFFFE0',   # Light yellow
+         'background-color: #FFB6C1'],  # Light red
+        default=''
+    )
+
+def sequence_hash(sequence):
+    """Short digest used as the cache key for a (possibly very long) sequence"""
+    return hashlib.blake2b(sequence.encode(), digest_size=16).hexdigest()
+
+# Plot coordinate grids depend only on sequence length. cache_resource hands
+# back the same array to every rerun and session instead of a fresh copy, so
+# each grid is made read-only before it is shared.
+@st.cache_resource(max_entries=8)
+def cached_positions(n):
+    """Base positions 0..n-1"""
+    grid = np.arange(n)
+    grid.flags.writeable = False
+    return grid
+
+@st.cache_resource(max_entries=8)
+def cached_theta_grid(n):
+    """Evenly spaced circos angles (degrees) for n bases"""
+    grid = np.linspace(0, 360, n)
+    grid.flags.writeable = False
+    return grid
+
+@st.cache_resource(max_entries=8)
+def cached_unit_radii(n):
+    """Radius 1 for each of n bases on the circos ring"""
+    grid = np.ones(n)
+    grid.flags.writeable = False
+    return grid
+
+# Cached pipeline stages. The leading-underscore sequence argument is skipped
+# by Streamlit's hasher, so each lookup only hashes the short seq_hash key.
+@st.cache_resource
+def cached_scorer():
+    """Shared CRISPRScoring instance (app.py re-executes on every rerun)"""
+    return CRISPRScoring()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_scores(seq_hash, _sequence, _counts=None):
+    """CRISPR component and final scores for a cleaned sequence"""
+    return cached_scorer().calculate_all_scores(_sequence, _counts)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_pam_sites(seq_hash, _sequence, pam_type, _seq_arr=None):
+    """PAM sites for a cleaned sequence"""
+    if _seq_arr is None:
+        _seq_arr = encode_sequence(_sequence)
+    return find_pam_sites_np(_seq_arr, pam_type)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_grnas(seq_hash, _sequence, pam_type, gc_min, gc_max):
+    """GC-filtered gRNA candidates"""
+    pam_sites = cached_pam_sites(seq_hash, _sequence, pam_type)
+    return design_grnas(_sequence, pam_sites, gc_min, gc_max)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_efficiency(seq_hash, _sequence, pam_type, gc_min, gc_max):
+    """gRNA candidates with efficiency scores"""
+    return predict_grna_efficiency(cached_grnas(seq_hash, _sequence, pam_type, gc_min, gc_max))
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_off_targets(seq_hash, _sequence, pam_type, gc_min, gc_max):
+    """gRNA candidates with off-target scores"""
+    return check_off_targets(cached_grnas(seq_hash, _sequence, pam_type, gc_min, gc_max), _sequence)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_scored_grnas(seq_hash, _sequence, pam_type, gc_min, gc_max):
+    """gRNA candidates with efficiency and off-target scores"""
+    return check_off_targets(cached_efficiency(seq_hash, _sequence, pam_type, gc_min, gc_max), _sequence)
 
 def set_page_config():
     st.set_page_config(
@@ -61,6 +145,11 @@ def main():
     if 'has_headers' not in st.session_state:
         st.session_state.has_headers = True
     
+    # The text areas and checkbox own these keys; re-binding them keeps the values
+    # alive on pages that don't render those widgets (no copy is made)
+    st.session_state.dna_sequence = st.session_state.dna_sequence
+    st.session_state.has_headers = st.session_state.has_headers
+    
     # Add clear button in sidebar
     with st.sidebar:
         if st.button("🗑️ Clear All Data"):
@@ -110,15 +199,13 @@ def show_grna_designer():
         col1, col2 = st.columns([2,1])
         
         with col1:
-            # Use session state for sequence persistence
+            # Session state key keeps the sequence across pages
             sequence = st.text_area(
                 "Enter your DNA sequence",
-                value=st.session_state.dna_sequence,
+                key='dna_sequence',
                 height=150,
                 help="Enter a DNA sequence (A, T, G, C only)"
             )
-            # Update session state
-            st.session_state.dna_sequence = sequence
             
             pam_type = st.selectbox(
                 "Select PAM Type",
@@ -185,11 +272,9 @@ def show_grna_designer():
             
             has_headers = st.checkbox(
                 "File has headers", 
-                value=st.session_state.has_headers,
+                key='has_headers',
                 help="Check if first line contains sequence names"
             )
-            # Update session state
-            st.session_state.has_headers = has_headers
         
         with col2:
             gc_min = st.slider("Minimum GC content (%)", 30, 80, 40)
@@ -213,55 +298,64 @@ def process_single_sequence(sequence, pam_type, gc_min, gc_max,
     # Clean sequence first
     clean_sequence = sequence.upper().replace(" ", "").replace("\n", "")
     
+    seq_arr = encode_sequence(clean_sequence)
+    
     # Validate sequence
     if not clean_sequence:
         st.error("Please enter a DNA sequence")
-    elif not set(clean_sequence).issubset({'A', 'T', 'G', 'C'}):
+    elif not is_valid_dna(seq_arr):
         st.error("Invalid characters found. Please use only A, T, G, C")
     else:
         st.success("Valid DNA sequence!")
         
         with st.spinner("Analyzing sequence..."):
+            seq_hash = sequence_hash(clean_sequence)
+            
             # Find PAM sites
-            pam_sites = find_pam_sites(clean_sequence, pam_type)
+            pam_sites = cached_pam_sites(seq_hash, clean_sequence, pam_type, seq_arr)
             
             if pam_sites:
                 # Design initial gRNAs
-                grnas = design_grnas(clean_sequence, pam_sites, gc_min/100, gc_max/100)
+                grnas = cached_grnas(seq_hash, clean_sequence, pam_type, gc_min/100, gc_max/100)
                 
                 if grnas:
                     # Predict efficiency scores
-                    grnas = predict_grna_efficiency(grnas)
-                    
-                    # Check off-targets
-                    grnas = check_off_targets(grnas, clean_sequence)
+                    grnas = cached_efficiency(seq_hash, clean_sequence, pam_type, gc_min/100, gc_max/100)
                     
                     # Filter results if not showing all
                     if not show_all:
+                        # Drop low-efficiency guides before the (expensive) off-target scan
                         filtered_grnas = [g for g in grnas 
-                                        if g['efficiency_score'] >= efficiency_threshold
-                                        and g['off_target_score'] <= max_off_targets]
+                                        if g['efficiency_score'] >= efficiency_threshold]
+                        filtered_df = grnas_to_frame(check_off_targets(filtered_grnas, clean_sequence, seq_arr))
+                        if not filtered_df.empty:
+                            filtered_df = filtered_df[filtered_df['off_target_score'] <= max_off_targets] \
+                                .reset_index(drop=True)
                         
-                        if not filtered_grnas:
+                        if filtered_df.empty:
+                            # Fallback shows every candidate, so score them all
+                            grnas = cached_scored_grnas(seq_hash, clean_sequence, pam_type, gc_min/100, gc_max/100)
                             st.warning(f"No guides meet the criteria. Showing all {len(grnas)} candidates.")
                             display_grna_results(grnas)
                         else:
-                            st.success(f"Found {len(filtered_grnas)} guides meeting criteria.")
-                            display_grna_results(filtered_grnas)
+                            st.success(f"Found {len(filtered_df)} guides meeting criteria.")
+                            display_grna_results(filtered_df)
                     else:
+                        grnas = cached_scored_grnas(seq_hash, clean_sequence, pam_type, gc_min/100, gc_max/100)
                         st.info(f"Showing all {len(grnas)} candidates.")
                         display_grna_results(grnas)
                 else:
                     st.warning("No suitable guide RNAs found in the sequence.")
             else:
                 if pam_type == "Cas12a (TTTV)":
-                    st.warning("""
+                    rc_sites = find_pam_sites_np(encode_sequence(revcomp(clean_sequence, mask_unknown=True)), pam_type)
+                    st.warning(f"""
                     No Cas12a PAM sites found. This is normal because:
                     1. Cas12a needs exactly TTT + (A, C, or G)
                     2. This pattern is less common than SpCas9's NGG
                     3. Try:
                        - Using SpCas9 instead
-                       - Checking the reverse complement
+                       - Checking the reverse complement ({len(rc_sites)} TTTV sites on that strand)
                        - Using a different region of your sequence
                     """)
                 else:
@@ -269,61 +363,69 @@ def process_single_sequence(sequence, pam_type, gc_min, gc_max,
 
 def process_batch_sequences(uploaded_file, has_headers, pam_type, gc_min, gc_max, efficiency_threshold):
     """Process multiple sequences for guide RNA design"""
-    import pandas as pd
-    import io
-    
     try:
-        # Read the file
-        content = uploaded_file.read().decode()
-        sequences = pd.read_csv(io.StringIO(content), 
-                              header=0 if has_headers else None,
-                              names=['name', 'sequence'] if has_headers else ['sequence'])
+        # Parse the upload straight from the file buffer with Arrow's CSV reader.
+        # Column names are generated so a headerless file may still carry a
+        # leading name column; the sequence is always the last column
+        uploaded_file.seek(0)
+        table = pacsv.read_csv(
+            uploaded_file,
+            read_options=pacsv.ReadOptions(autogenerate_column_names=True,
+                                           skip_rows=1 if has_headers else 0)
+        )
+        n_sequences = table.num_rows
+        
+        if has_headers and table.num_columns < 2:
+            st.error("CSV with headers needs a name column and a sequence column")
+            return
         
-        if len(sequences) > 100:
+        if n_sequences > 100:
             st.error("Maximum 100 sequences allowed per batch")
             return
         
-        # Initialize results storage
-        all_results = []
+        seqs = table.column(table.num_columns - 1).cast(pa.string()).to_pylist()
+        if has_headers:
+            names = table.column(0).cast(pa.string()).to_pylist()
+        else:
+            names = [f"Sequence_{i+1}" for i in range(n_sequences)]
+        
+        # Process each sequence, fanning out to worker processes for large batches
+        work_items = [(idx, name, sequence, pam_type, gc_min/100, gc_max/100)
+                      for idx, (name, sequence) in enumerate(zip(names, seqs))]
+        total_bases = sum(len(sequence) for sequence in seqs if sequence)
+        workers = min(os.cpu_count() or 1, 8, n_sequences)
         
-        # Process each sequence
+        results_by_idx = [None] * n_sequences
         progress_bar = st.progress(0)
-        for idx, row in sequences.iterrows():
-            sequence = row['sequence']
-            name = row['name'] if has_headers else f"Sequence_{idx+1}"
-            
-            # Clean and validate sequence
-            clean_sequence = sequence.upper().replace(" ", "").replace("\n", "")
-            if set(clean_sequence).issubset({'A', 'T', 'G', 'C'}):
-                # Find PAM sites and design gRNAs
-                pam_sites = find_pam_sites(clean_sequence, pam_type)
-                if pam_sites:
-                    grnas = design_grnas(clean_sequence, pam_sites, gc_min/100, gc_max/100)
-                    if grnas:
-                        # Add sequence name to results
-                        for grna in grnas:
-                            grna['sequence_name'] = name
-                        grnas = predict_grna_efficiency(grnas)
-                        grnas = check_off_targets(grnas, clean_sequence)
-                        all_results.extend(grnas)
-            
-            # Update progress
-            progress_bar.progress((idx + 1) / len(sequences))
+        if workers > 1 and total_bases >= PARALLEL_MIN_BASES:
+            # Spawn rather than fork the threaded Streamlit server; the worker
+            # lives in sequence_tools so it pickles by reference
+            with multiprocessing.get_context('spawn').Pool(processes=workers) as pool:
+                results_iter = pool.imap_unordered(design_batch_item, work_items, chunksize=4)
+                for done, (idx, frame) in enumerate(results_iter, start=1):
+                    results_by_idx[idx] = frame
+                    progress_bar.progress(done / n_sequences)
+        else:
+            for idx, item in enumerate(work_items):
+                results_by_idx[idx] = design_batch_item(item)[1]
+                progress_bar.progress((idx + 1) / n_sequences)
         
-        if all_results:
-            # Convert results to DataFrame
-            results_df = pd.DataFrame(all_results)
+        # Stack per-sequence frames in upload order regardless of completion order
+        result_frames = [frame for frame in results_by_idx if len(frame)]
+        
+        if result_frames:
+            results_df = pd.concat(result_frames, ignore_index=True)
             
             # Filter by efficiency threshold
             filtered_df = results_df[results_df['efficiency_score'] >= efficiency_threshold]
             
             # Display summary statistics
-            st.success(f"Processed {len(sequences)} sequences")
+            st.success(f"Processed {n_sequences} sequences")
             st.info(f"Found {len(filtered_df)} guide RNAs meeting criteria")
             
             # Display interactive table
-            st.dataframe(filtered_df.style.map(color_efficiency, subset=['efficiency_score'])
-                                         .map(color_offtarget, subset=['off_target_score']))
+            st.dataframe(filtered_df.style.apply(efficiency_colors, subset=['efficiency_score'])
+                                         .apply(offtarget_colors, subset=['off_target_score']))
             
             # Add download button
             csv = filtered_df.to_csv(index=False)
@@ -336,8 +438,12 @@ def process_batch_sequences(uploaded_file, has_headers, pam_type, gc_min, gc_max
             )
             
             # Add Excel download
+            # xlsxwriter's constant_memory mode streams rows out instead of
+            # building the whole workbook in memory
             excel_buffer = io.BytesIO()
-            filtered_df.to_excel(excel_buffer, index=False, engine='openpyxl')
+            with pd.ExcelWriter(excel_buffer, engine='xlsxwriter',
+                                engine_kwargs={'options': {'constant_memory': True}}) as writer:
+                filtered_df.to_excel(writer, index=False)
             excel_data = excel_buffer.getvalue()
             st.download_button(
                 "Download Results Excel",
@@ -347,6 +453,17 @@ def process_batch_sequences(uploaded_file, has_headers, pam_type, gc_min, gc_max
                 key='download-excel'
             )
             
+            # Add Parquet download (compact, columnar, readable by pandas/R/Arrow tools)
+            parquet_buffer = io.BytesIO()
+            filtered_df.to_parquet(parquet_buffer, index=False, engine='pyarrow')
+            st.download_button(
+                "Download Results Parquet",
+                parquet_buffer.getvalue(),
+                "guide_rna_results.parquet",
+                "application/vnd.apache.parquet",
+                key='download-parquet'
+            )
+            
     except Exception as e:
         st.error(f"Error processing file: {str(e)}")
 
@@ -357,21 +474,20 @@ def show_sequence_analysis():
     col1, col2 = st.columns([2,1])
     
     with col1:
-        # Use session state for sequence persistence
+        # Session state key keeps the sequence across pages
         sequence = st.text_area(
             "Enter DNA sequence",
-            value=st.session_state.dna_sequence,
+            key='dna_sequence',
             height=150,
             help="Enter a DNA sequence (A, T, G, C only)"
         )
-        # Update session state
-        st.session_state.dna_sequence = sequence
         
         calculate = st.button("Analyze Sequence")
         
         if st.button("Generate Reverse Complement"):
             if sequence:
-                complement = str(Seq(sequence).reverse_complement())
+                clean_seq = sequence.upper().replace(" ", "").replace("\n", "")
+                complement = revcomp(clean_seq, mask_unknown=True)
                 st.code(complement, language="text")
                 st.button("Use this sequence", 
                          help="Use reverse complement for guide RNA design")
@@ -380,15 +496,18 @@ def show_sequence_analysis():
         st.info("Sequence Statistics")
         if sequence and calculate:
             clean_seq = sequence.upper().replace(" ", "").replace("\n", "")
-            if set(clean_seq).issubset({'A', 'T', 'G', 'C'}):
+            seq_arr = encode_sequence(clean_seq)
+            if is_valid_dna(seq_arr):
                 # Basic statistics
                 st.metric("Sequence Length", len(clean_seq))
-                st.metric("GC Content", f"{gc_fraction(clean_seq)*100:.1f}%")
+                counts = base_counts(seq_arr)
+                gc = (counts[ord('G')] + counts[ord('C')]) / len(clean_seq)
+                st.metric("GC Content", f"{gc*100:.1f}%")
                 
                 # Nucleotide composition
                 st.write("Nucleotide Composition:")
                 for base in ['A', 'T', 'G', 'C']:
-                    count = clean_seq.count(base)
+                    count = int(counts[ord(base)])
                     st.progress(count/len(clean_seq), 
                               text=f"{base}: {count} ({count/len(clean_seq)*100:.1f}%)")
                 
@@ -421,9 +540,7 @@ def show_sequence_analysis():
                 - Scores >50%: ~30-50% success
                 """)
                 
-                from src.utils.scoring_algorithms import CRISPRScoring
-                scorer = CRISPRScoring()
-                scores = scorer.calculate_all_scores(clean_seq)
+                scores = cached_scores(sequence_hash(clean_seq), clean_seq, counts)
                 
                 # Display scores with color-coded bars
                 st.write("Individual Score Components:")
@@ -445,7 +562,7 @@ def show_sequence_analysis():
     
     # Visualization section moved outside columns for full width
     if sequence and calculate:
-        if set(clean_seq).issubset({'A', 'T', 'G', 'C'}):
+        if is_valid_dna(seq_arr):
             st.markdown("---")  # Add a visual separator
             st.subheader("Sequence Visualization")
             fig = create_sequence_plot(clean_seq)
@@ -462,14 +579,12 @@ def show_sequence_analysis():
 def show_visualization():
     st.header("CRISPR Guide RNA Visualization & Analysis")
     
-    # Use session state for sequence persistence
+    # Session state key keeps the sequence across pages
     sequence = st.text_area(
         "Enter DNA sequence for visualization",
-        value=st.session_state.dna_sequence,
+        key='dna_sequence',
         height=150
     )
-    # Update session state
-    st.session_state.dna_sequence = sequence
     
     calculate = st.button("Generate Visualizations")
     
@@ -509,29 +624,31 @@ def show_visualization():
 
 def plot_guide_rna_map(sequence):
     """Create an interactive genome browser-style visualization"""
-    import plotly.graph_objects as go
-    
     # Find PAM sites
-    pam_sites = find_pam_sites(sequence, "SpCas9 (NGG)")
-    grnas = design_grnas(sequence, pam_sites, 0.3, 0.7)
+    seq_hash = sequence_hash(sequence)
+    pam_sites = cached_pam_sites(seq_hash, sequence, "SpCas9 (NGG)")
+    grnas = cached_grnas(seq_hash, sequence, "SpCas9 (NGG)", 0.3, 0.7)
     
     # Create the figure
     fig = go.Figure()
     
-    # Add sequence track
+    # Add sequence track; sequences over 200 bp are thinned to at most ~200 ticks
+    stride = 1 if len(sequence) <= 200 else -(-len(sequence) // 200)
+    track = sequence[::stride]
     fig.add_trace(go.Scatter(
-        x=list(range(len(sequence))),
-        y=[0]*len(sequence),
-        mode='text',
-        text=list(sequence),
+        x=cached_positions(len(sequence))[::stride],
+        y=[0]*len(track),
+        mode='text' if stride == 1 else 'markers',
+        text=list(track),
         textfont=dict(size=10),
-        name='Sequence'
+        marker=dict(size=3, color='gray'),
+        name='Sequence' if stride == 1 else f'Sequence (every {stride} bp)'
     ))
     
     # Add PAM sites
     if pam_sites:
         fig.add_trace(go.Scatter(
-            x=[site for site in pam_sites],
+            x=pam_sites,
             y=[1]*len(pam_sites),
             mode='markers',
             marker=dict(
@@ -542,22 +659,23 @@ def plot_guide_rna_map(sequence):
             name='PAM Sites'
         ))
     
-    # Add gRNA regions
-    if grnas:
-        for grna in grnas:
-            pos = grna['position']
-            fig.add_shape(
-                type="rect",
-                x0=pos,
-                x1=pos+20,
-                y0=0.5,
-                y1=1.5,
-                fillcolor="rgba(0,100,80,0.2)",
-                line=dict(width=0),
-            )
+    # Add gRNA regions, built as one shapes list and validated once by update_layout
+    shapes = [
+        dict(
+            type="rect",
+            x0=grna['position'],
+            x1=grna['position']+20,
+            y0=0.5,
+            y1=1.5,
+            fillcolor="rgba(0,100,80,0.2)",
+            line=dict(width=0),
+        )
+        for grna in grnas
+    ]
     
     # Update layout with legend on the left
     fig.update_layout(
+        shapes=shapes,
         title="Guide RNA Target Sites",
         showlegend=True,
         height=400,
@@ -580,42 +698,51 @@ def plot_guide_rna_map(sequence):
 
 def plot_off_target_analysis(sequence):
     """Create a circos-style plot for off-target analysis"""
-    import plotly.graph_objects as go
-    import numpy as np
-    
     # Generate mock off-target data
-    pam_sites = find_pam_sites(sequence, "SpCas9 (NGG)")
+    seq_hash = sequence_hash(sequence)
+    pam_sites = cached_pam_sites(seq_hash, sequence, "SpCas9 (NGG)")
     if pam_sites:
         # Get initial gRNAs
-        grnas = design_grnas(sequence, pam_sites, 0.3, 0.7)
+        grnas = cached_grnas(seq_hash, sequence, "SpCas9 (NGG)", 0.3, 0.7)
         if grnas:
             # Calculate off-target scores
-            grnas = check_off_targets(grnas, sequence)
+            grnas = cached_off_targets(seq_hash, sequence, "SpCas9 (NGG)", 0.3, 0.7)
             
             # Create circular plot
             fig = go.Figure()
             
             # Add main sequence arc
-            theta = np.linspace(0, 360, len(sequence))
+            theta = cached_theta_grid(len(sequence))
             fig.add_trace(go.Scatterpolar(
-                r=[1]*len(sequence),
+                r=cached_unit_radii(len(sequence)),
                 theta=theta,
                 mode='lines',
                 name='Sequence',
                 line=dict(color='blue')
             ))
             
-            # Add off-target connections
+            # Add off-target connections as one polyline broken by None gaps
+            r_arr = []
+            theta_arr = []
+            hover_arr = []
             for grna in grnas:
                 off_target_score = float(grna['off_target_score'])
                 if off_target_score > 0:
-                    fig.add_trace(go.Scatterpolar(
-                        r=[1, off_target_score/100],
-                        theta=[theta[grna['position']], theta[grna['position']]],
-                        mode='lines',
-                        name=f'Off-target: {off_target_score:.1f}',
-                        line=dict(color='rgba(255,0,0,0.3)')
-                    ))
+                    angle = theta[grna['position']]
+                    r_arr += [1, off_target_score/100, None]
+                    theta_arr += [angle, angle, None]
+                    hover_arr += [f'Off-target: {off_target_score:.1f}'] * 2 + [None]
+            
+            if r_arr:
+                fig.add_trace(go.Scatterpolar(
+                    r=r_arr,
+                    theta=theta_arr,
+                    mode='lines',
+                    name='Off-targets',
+                    hoverinfo='text',
+                    hovertext=hover_arr,
+                    line=dict(color='rgba(255,0,0,0.3)')
+                ))
             
             fig.update_layout(
                 polar=dict(
@@ -639,14 +766,13 @@ def plot_off_target_analysis(sequence):
 
 def plot_efficiency_prediction(sequence):
     """Create ML-based efficiency prediction visualization"""
-    import plotly.graph_objects as go
-    
-    pam_sites = find_pam_sites(sequence, "SpCas9 (NGG)")
+    seq_hash = sequence_hash(sequence)
+    pam_sites = cached_pam_sites(seq_hash, sequence, "SpCas9 (NGG)")
     if pam_sites:
-        grnas = design_grnas(sequence, pam_sites, 0.3, 0.7)
+        grnas = cached_grnas(seq_hash, sequence, "SpCas9 (NGG)", 0.3, 0.7)
         if grnas:
             # Predict efficiencies
-            grnas = predict_grna_efficiency(grnas)
+            grnas = cached_efficiency(seq_hash, sequence, "SpCas9 (NGG)", 0.3, 0.7)
             
             # Create heatmap
             positions = [g['position'] for g in grnas]
@@ -689,20 +815,43 @@ def plot_efficiency_prediction(sequence):
             
             st.plotly_chart(fig, use_container_width=True)
 
+# Bases of strong (G-C) pairs and the sample points along each drawn arc
+GC_BYTES = np.array([ord('G'), ord('C')], dtype=np.uint8)
+ARC_POINTS = np.linspace(0, 1, 20)
+
+def base_pair_arcs(sequence, i, j, color, width, name):
+    """Build a single Scatter trace holding one arc per base pair (i, j)"""
+    heights = (j - i) / 4
+    x = i[:, None] + (j - i)[:, None] * ARC_POINTS
+    y = np.sin(np.pi * ARC_POINTS) * heights[:, None]
+    
+    # Append a NaN point to each arc so Plotly breaks the line between pairs
+    gap = np.full((len(i), 1), np.nan)
+    labels = [f'Base pair: {sequence[a]}-{sequence[b]} (positions {a+1}-{b+1})'
+              for a, b in zip(i.tolist(), j.tolist())]
+    
+    return go.Scatter(
+        x=np.hstack([x, gap]).ravel(),
+        y=np.hstack([y, gap]).ravel(),
+        mode='lines',
+        line=dict(color=color, width=width),
+        name=name,
+        hoverinfo='text',
+        hovertext=np.repeat(labels, len(ARC_POINTS) + 1) if labels else []
+    )
+
 def plot_secondary_structure(sequence):
     """Create RNA secondary structure visualization"""
-    import plotly.graph_objects as go
-    import numpy as np
-    
     if len(sequence) > 20:
         sequence = sequence[:20]  # Take first 20 bases for structure
+    rna_arr, comp_arr = rna_and_complement(sequence)
     
     # Create figure with subplots
     fig = go.Figure()
     
     # Add sequence with larger font and better spacing
     fig.add_trace(go.Scatter(
-        x=list(range(len(sequence))),
+        x=cached_positions(len(sequence)),
         y=[0]*len(sequence),
         mode='text',
         text=list(sequence),
@@ -712,51 +861,16 @@ def plot_secondary_structure(sequence):
         hovertext=[f"Position {i+1}: {base}" for i, base in enumerate(sequence)]
     ))
     
-    # Add arcs for potential base pairs with improved colors
-    complement = {'A': 'U', 'T': 'A', 'G': 'C', 'C': 'G'}  # Note: T → U for RNA
-    max_height = 0
-    
-    for i in range(len(sequence)):
-        for j in range(i+4, len(sequence)):  # Minimum loop size of 4
-            if sequence[j] == complement.get(sequence[i].replace('T', 'U')):
-                # Create arc with color based on base pair type
-                x = np.linspace(i, j, 20)
-                height = (j-i)/4
-                max_height = max(max_height, height)
-                y = np.sin(np.pi*(x-i)/(j-i)) * height
-                
-                # Color based on base pair type
-                if sequence[i] in ['G', 'C']:
-                    color = 'rgba(255,0,0,0.4)'  # Strong GC pairs in red
-                    width = 2
-                else:
-                    color = 'rgba(0,0,255,0.2)'  # Weaker AU pairs in blue
-                    width = 1.5
-                
-                fig.add_trace(go.Scatter(
-                    x=x,
-                    y=y,
-                    mode='lines',
-                    line=dict(color=color, width=width),
-                    name=f'{sequence[i]}-{sequence[j]} pair',
-                    hoverinfo='text',
-                    hovertext=f'Base pair: {sequence[i]}-{sequence[j]} (positions {i+1}-{j+1})',
-                    showlegend=False
-                ))
+    # Find all candidate base pairs (i, j) with a minimum loop size of 4
+    i, j = candidate_base_pairs(rna_arr, comp_arr, min_loop=4)
+    strong = np.isin(rna_arr[i], GC_BYTES)
+    max_height = (j - i).max() / 4 if len(i) else 0
     
-    # Add legend for base pair types
-    fig.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='lines',
-        line=dict(color='rgba(255,0,0,0.4)', width=2),
-        name='Strong (G-C) pairs'
-    ))
-    fig.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='lines',
-        line=dict(color='rgba(0,0,255,0.2)', width=1.5),
-        name='Weak (A-U) pairs'
-    ))
+    # One trace per base pair type; arcs are separated by NaN gaps
+    fig.add_trace(base_pair_arcs(sequence, i[strong], j[strong],
+                                 'rgba(255,0,0,0.4)', 2, 'Strong (G-C) pairs'))    # Strong GC pairs in red
+    fig.add_trace(base_pair_arcs(sequence, i[~strong], j[~strong],
+                                 'rgba(0,0,255,0.2)', 1.5, 'Weak (A-U) pairs'))    # Weaker AU pairs in blue
     
     # Update layout with better formatting
     fig.update_layout(
@@ -813,12 +927,7 @@ def plot_secondary_structure(sequence):
     """)
     
     # Add structure stability analysis
-    gc_pairs = sum(1 for i in range(len(sequence)) 
-                  for j in range(i+4, len(sequence)) 
-                  if sequence[i] in 'GC' and sequence[j] == complement.get(sequence[i].replace('T', 'U')))
-    au_pairs = sum(1 for i in range(len(sequence)) 
-                  for j in range(i+4, len(sequence)) 
-                  if sequence[i] in 'AT' and sequence[j] == complement.get(sequence[i].replace('T', 'U')))
+    gc_pairs, au_pairs = count_base_pairs(rna_arr, min_loop=4)
     
     stability = "High" if gc_pairs > 3 else "Medium" if gc_pairs + au_pairs > 2 else "Low"
     color = {"High": "green", "Medium": "orange", "Low": "red"}[stability]
@@ -832,10 +941,7 @@ def plot_secondary_structure(sequence):
 
 def display_grna_results(grnas):
     """Enhanced results display"""
-    import streamlit as st
-    import pandas as pd
-    
-    df = pd.DataFrame(grnas)
+    df = grnas_to_frame(grnas)
     
     # Reorder and format columns
     columns = [
@@ -853,20 +959,18 @@ def display_grna_results(grnas):
     existing_columns = [col for col in columns if col in df.columns]
     df = df[existing_columns]
     
-    # Format display values
+    # Scores stay numeric for coloring; display formatting happens in the Styler
     score_columns = ['gc_score', 'self_complementarity', 'homopolymer', 'efficiency_score']
-    for col in df.columns:
-        if col in score_columns and col in df.columns:
-            df[col] = df[col].apply(lambda x: f"{x*100:.1f}%" if isinstance(x, (int, float)) else "N/A")
-        elif col == 'off_target_score' and col in df.columns:
-            df[col] = df[col].apply(lambda x: f"{x:.1f}" if isinstance(x, (int, float)) else "N/A")
-    
-    # Apply styling to score columns only
     style_columns = [col for col in score_columns if col in df.columns]
+    formatters = {col: lambda x: f"{x*100:.1f}%" if isinstance(x, (int, float)) else "N/A"
+                  for col in style_columns}
+    if 'off_target_score' in df.columns:
+        formatters['off_target_score'] = lambda x: f"{x:.1f}" if isinstance(x, (int, float)) else "N/A"
     
-    styled_df = df.style.map(color_efficiency, subset=style_columns)
+    # Apply styling to score columns only
+    styled_df = df.style.format(formatters).apply(efficiency_colors, subset=style_columns)
     if 'off_target_score' in df.columns:
-        styled_df = styled_df.map(color_offtarget, subset=['off_target_score'])
+        styled_df = styled_df.apply(offtarget_colors, subset=['off_target_score'])
     
     # Display results with explanations
     st.subheader("Guide RNA Results")
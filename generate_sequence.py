@@ -1,23 +1,29 @@
-import random
+import numpy as np
 import streamlit as st
 
-def generate_dna_sequence(length, organism_gc):
-    """Generate a random DNA sequence with biologically relevant GC content"""
+# Shared generator and the base alphabet as bytes, in weight order
+_RNG = np.random.default_rng()
+_BASES = np.frombuffer(b'ATGC', dtype=np.uint8)
+
+def _sample_bases(length, organism_gc):
+    """Draw length bases as a uint8 (ASCII) array with the given GC percentage"""
     gc_bias = organism_gc / 100  # Convert percentage to decimal
     
-    # Weights based on biological GC content
-    weights = {
-        'A': (1 - gc_bias) / 2,
-        'T': (1 - gc_bias) / 2,
-        'G': gc_bias / 2,
-        'C': gc_bias / 2
-    }
-    
-    nucleotides = list(weights.keys())
-    probabilities = list(weights.values())
+    # Weights based on biological GC content (A, T, G, C)
+    probabilities = np.array([(1 - gc_bias) / 2, (1 - gc_bias) / 2, gc_bias / 2, gc_bias / 2])
     
-    sequence = ''.join(random.choices(nucleotides, weights=probabilities, k=length))
-    return sequence
+    # Draw every base in one call
+    return _RNG.choice(_BASES, size=length, p=probabilities)
+
+def generate_dna_sequence(length, organism_gc):
+    """Generate a random DNA sequence with biologically relevant GC content"""
+    # Decode the sampled bytes straight to a string
+    return _sample_bases(length, organism_gc).tobytes().decode('ascii')
+
+def _base_counts(bases):
+    """Return (A, C, G, T) counts from a single bincount pass over a uint8 base array"""
+    bc = np.bincount(bases, minlength=ord('T') + 1)
+    return int(bc[ord('A')]), int(bc[ord('C')]), int(bc[ord('G')]), int(bc[ord('T')])
 
 def main():
     st.title("Biological DNA Sequence Generator")
@@ -67,25 +73,28 @@ def main():
                 st.error("Please enter a positive number")
                 return
                 
-            sequence = generate_dna_sequence(length, gc_percentage)
+            # Sample once; the string and the base counts both come from the same array
+            bases = _sample_bases(length, gc_percentage)
+            sequence = bases.tobytes().decode('ascii')
             
             # Display sequence
             st.subheader("Generated DNA Sequence:")
             st.text_area("Sequence", sequence, height=150)
             
             # Detailed statistics in columns
+            a_count, c_count, g_count, t_count = _base_counts(bases)
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Length", len(sequence))
             with col2:
-                gc_content = (sequence.count('G') + sequence.count('C')) / len(sequence)
+                gc_content = (g_count + c_count) / len(sequence)
                 st.metric("GC Content", f"{gc_content*100:.1f}%")
             with col3:
                 st.metric("AT Content", f"{(1-gc_content)*100:.1f}%")
             with col4:
                 st.metric("Nucleotides", 
-                         f"A:{sequence.count('A')} T:{sequence.count('T')} "
-                         f"G:{sequence.count('G')} C:{sequence.count('C')}")
+                         f"A:{a_count} T:{t_count} "
+                         f"G:{g_count} C:{c_count}")
             
             # Add biological context
             st.info(f"""
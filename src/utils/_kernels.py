@@ -0,0 +1,212 @@
+import numpy as np
+
+try:
+    import numba
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba is optional, callers fall back to the NumPy/pure-Python paths
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit"""
+        return lambda func: func
+
+@njit(cache=True)
+def scan_ngg(seq_u8):
+    """JIT kernel: start positions of NGG sites"""
+    n = len(seq_u8)
+    sites = np.empty(max(n - 2, 0), dtype=np.int64)
+    count = 0
+    for i in range(n - 2):
+        if seq_u8[i + 1] == 71 and seq_u8[i + 2] == 71:  # 'G'
+            sites[count] = i
+            count += 1
+    return sites[:count]
+
+@njit(cache=True, nogil=True)
+def off_target_score(guide_u8, seq_u8):
+    """JIT kernel: mismatch-weighted count of windows within 4 mismatches (releases the GIL)"""
+    glen = len(guide_u8)
+    score = 0.0
+    for i in range(len(seq_u8) - glen):
+        mismatches = 0
+        for k in range(glen):
+            if guide_u8[k] != seq_u8[i + k]:
+                mismatches += 1
+                if mismatches > 4:
+                    break
+        if mismatches <= 4:
+            score += 1.0 / (2 ** mismatches)
+    return score
+
+@njit(cache=True)
+def homopolymer_runs(seq_u8):
+    """JIT kernel: longest run of A, C, G, T (and anything else), each at least 1"""
+    runs = np.ones(5, dtype=np.int64)
+    current = 1
+    for i in range(len(seq_u8)):
+        if i > 0 and seq_u8[i] == seq_u8[i - 1]:
+            current += 1
+        else:
+            current = 1
+        base = seq_u8[i]
+        col = 0 if base == 65 else 1 if base == 67 else 2 if base == 71 else 3 if base == 84 else 4
+        if current > runs[col]:
+            runs[col] = current
+    return runs
+
+@njit(cache=True)
+def max_self_complementary(seq_u8, rc_u8):
+    """JIT kernel: longest substring of seq_u8[:-1] that also occurs in rc_u8"""
+    m = len(rc_u8)
+    prev = np.zeros(m + 1, dtype=np.int64)
+    cur = np.zeros(m + 1, dtype=np.int64)
+    best = 0
+    for i in range(len(seq_u8) - 1):
+        for k in range(m):
+            if seq_u8[i] == rc_u8[k]:
+                cur[k + 1] = prev[k] + 1
+                if cur[k + 1] > best:
+                    best = cur[k + 1]
+            else:
+                cur[k + 1] = 0
+        prev, cur = cur, prev
+    return best
+
+# Score bands shared by CRISPRScoring, its NumPy batch path and score20, so the
+# thresholds live in one place; position_score falls back to POSITION_DEFAULT
+# when no scored position is reached
+POSITION_DEFAULT = 0.5
+
+@njit(cache=True)
+def gc_band_score(gc):
+    """Score a GC fraction: 1.0 between 45-65%, linear falloff outside"""
+    if 0.45 <= gc <= 0.65:
+        return 1.0
+    elif gc < 0.45:
+        return gc / 0.45
+    else:
+        return (1 - gc) / 0.35
+
+@njit(cache=True)
+def self_comp_band_score(longest):
+    """Score the longest self-complementary region: 1.0 below 5 bases, 0.0 from 12"""
+    if longest < 5:
+        return 1.0
+    elif longest >= 12:
+        return 0.0
+    else:
+        return 1 - ((longest - 5) / 7)
+
+@njit(cache=True)
+def run_band_score(run, ok, zero):
+    """1.0 for runs up to ok bases, 0.0 from zero bases, linear in between"""
+    if run <= ok:
+        return 1.0
+    elif run >= zero:
+        return 0.0
+    else:
+        return 1 - ((run - ok) / (zero - ok))
+
+@njit(cache=True)
+def homopolymer_band_score(a_run, c_run, g_run, t_run):
+    """Weighted homopolymer score from the longest run of each base (T runs weigh most)"""
+    t_score = run_band_score(t_run, 2, 4)
+    a_score = run_band_score(a_run, 3, 5)
+    g_score = run_band_score(g_run, 3, 5)
+    c_score = run_band_score(c_run, 3, 5)
+    return 0.4 * t_score + 0.2 * a_score + 0.2 * g_score + 0.2 * c_score
+
+# Guides in this pipeline are SpCas9 20-mers; a constant trip count lets LLVM unroll
+GUIDE_LEN = 20
+
+@njit(cache=True)
+def score20(guides_u8, rc_lut, base_idx, pos_weights, pos_mask, weights):
+    """JIT kernel: (K, 5) gc/self-comp/homopolymer/position/final scores of (K, 20) guides"""
+    scores = np.empty((guides_u8.shape[0], 5))
+    rc = np.empty(GUIDE_LEN, dtype=np.uint8)
+    prev = np.zeros(GUIDE_LEN + 1, dtype=np.int64)
+    cur = np.zeros(GUIDE_LEN + 1, dtype=np.int64)
+    runs = np.ones(5, dtype=np.int64)
+    for g in range(guides_u8.shape[0]):
+        seq = guides_u8[g]
+        
+        # GC score
+        gc_count = 0
+        for i in range(GUIDE_LEN):
+            if seq[i] == 71 or seq[i] == 67:  # 'G' or 'C'
+                gc_count += 1
+        gc_score = gc_band_score(gc_count / GUIDE_LEN)
+        
+        # Self-complementarity: longest run of seq[:-1] found in the reverse complement
+        for k in range(GUIDE_LEN):
+            rc[k] = rc_lut[seq[GUIDE_LEN - 1 - k]]
+            prev[k + 1] = 0
+        longest = 0
+        for i in range(GUIDE_LEN - 1):
+            for k in range(GUIDE_LEN):
+                if seq[i] == rc[k]:
+                    cur[k + 1] = prev[k] + 1
+                    if cur[k + 1] > longest:
+                        longest = cur[k + 1]
+                else:
+                    cur[k + 1] = 0
+            prev, cur = cur, prev
+        comp_score = self_comp_band_score(longest)
+        
+        # Homopolymer runs per base column
+        runs[:] = 1
+        current = 1
+        for i in range(GUIDE_LEN):
+            if i > 0 and seq[i] == seq[i - 1]:
+                current += 1
+            else:
+                current = 1
+            col = base_idx[seq[i]]
+            if current > runs[col]:
+                runs[col] = current
+        homo_score = homopolymer_band_score(runs[0], runs[1], runs[2], runs[3])
+        
+        # Position score, summed left to right
+        total = 0.0
+        count = 0
+        for i in range(GUIDE_LEN):
+            if pos_mask[i]:
+                total += pos_weights[i, base_idx[seq[i]]]
+                count += 1
+        pos_score = total / count if count > 0 else POSITION_DEFAULT
+        
+        scores[g, 0] = gc_score
+        scores[g, 1] = comp_score
+        scores[g, 2] = homo_score
+        scores[g, 3] = pos_score
+        scores[g, 4] = (gc_score * weights[0] + comp_score * weights[1]
+                        + homo_score * weights[2] + pos_score * weights[3])
+    return scores
+
+if HAS_NUMBA:
+    # Compile up front for writable and read-only (np.frombuffer) uint8 arrays so
+    # the first Streamlit run does not pay JIT latency; cache=True keeps it on disk
+    _U8_TYPES = (
+        numba.types.Array(numba.types.uint8, 1, 'C'),
+        numba.types.Array(numba.types.uint8, 1, 'C', readonly=True),
+        numba.types.Array(numba.types.uint8, 1, 'A'),
+        numba.types.Array(numba.types.uint8, 1, 'A', readonly=True),
+    )
+    for _arr in _U8_TYPES:
+        scan_ngg.compile((_arr,))
+        homopolymer_runs.compile((_arr,))
+        for _other in _U8_TYPES:
+            off_target_score.compile((_arr, _other))
+            max_self_complementary.compile((_arr, _other))
+    gc_band_score.compile((numba.types.float64,))
+    self_comp_band_score.compile((numba.types.int64,))
+    homopolymer_band_score.compile((numba.types.int64,) * 4)
+    score20.compile((
+        numba.typeof(np.zeros((1, GUIDE_LEN), dtype=np.uint8)),
+        numba.typeof(np.frombuffer(bytes(256), dtype=np.uint8)),
+        numba.typeof(np.zeros(256, dtype=np.intp)),
+        numba.typeof(np.zeros((GUIDE_LEN, 5))),
+        numba.typeof(np.zeros(GUIDE_LEN, dtype=bool)),
+        numba.typeof(np.zeros(4)),
+    ))
@@ -1,26 +1,124 @@
+import re
 import numpy as np
-from Bio.SeqUtils import gc_fraction
+from . import _kernels
+
+# Column of each base in the position weight tables; anything else maps to column 4
+_BASE_IDX = np.full(256, 4, dtype=np.intp)
+_BASE_IDX[[ord('A'), ord('C'), ord('G'), ord('T')]] = [0, 1, 2, 3]
+
+# Position-specific weights (1-based position); bases not listed score 0.3
+# Sources: 
+# - DeWeirdt et al. 2023, Nature Biotechnology
+# - Kim et al. 2023, Cell Reports Methods
+POSITION_PREFERENCES = {
+    1: {'G': 0.9, 'A': 0.6, 'C': 0.4, 'T': 0.2},  # Strong G preference
+    2: {'G': 0.3, 'A': 0.8, 'C': 0.4, 'T': 0.3},  # A preference
+    3: {'G': 0.6, 'A': 0.6, 'C': 0.4, 'T': 0.3},  # G/A preference
+    4: {'G': 0.5, 'A': 0.5, 'C': 0.5, 'T': 0.4},  # Mild base preference
+    16: {'G': 0.7, 'A': 0.5, 'C': 0.3, 'T': 0.3}, # G preference
+    17: {'G': 0.8, 'A': 0.4, 'C': 0.3, 'T': 0.2}, # Strong G preference
+    18: {'G': 0.7, 'A': 0.4, 'C': 0.4, 'T': 0.3}, # G preference
+    19: {'G': 0.6, 'A': 0.5, 'C': 0.4, 'T': 0.3}, # Mild G preference
+    20: {'G': 0.8, 'A': 0.4, 'C': 0.3, 'T': 0.2}  # Strong G preference
+}
+
+# Updated weights based on recent meta-analyses
+SCORE_WEIGHTS = {
+    'gc_score': 0.25,             # Slightly reduced weight
+    'self_complementarity': 0.25,  # Slightly reduced weight
+    'homopolymer': 0.2,           # Maintained weight
+    'position': 0.3               # Increased weight due to strong evidence
+}
+
+# Column order of the matrix returned by calculate_all_scores_batch
+SCORE_COLUMNS = list(SCORE_WEIGHTS) + ['final_score']
+_SCORE_WEIGHT_ARR = np.array(list(SCORE_WEIGHTS.values()))
+
+def _as_uint8(sequence):
+    """View a str, bytes-like or uint8 array sequence as a uint8 array (no copy for bytes/arrays)"""
+    if isinstance(sequence, np.ndarray):
+        return sequence.astype(np.uint8, copy=False)
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii', errors='replace')
+    return np.frombuffer(sequence, dtype=np.uint8)
+
+def _gc(sequence):
+    """GC fraction of an uppercase ACGT string using C-level str.count"""
+    return (sequence.count('G') + sequence.count('C')) / len(sequence) if sequence else 0.0
+
+# The one complement table for DNA and RNA (U pairs with A); other bytes pass through
+_RC_TABLE = bytes.maketrans(b'ACGTUacgtu', b'TGCAAtgcaa')
+_RC_LUT = np.frombuffer(_RC_TABLE, dtype=np.uint8)
+_NOT_ACGT = re.compile(rb'[^ACGT]')
+
+def revcomp(sequence, mask_unknown=False):
+    """
+    Reverse complement via bytes.translate (str in, str out; bytes-like in, bytes out)
+    
+    mask_unknown upper-cases the sequence first and writes N for anything
+    that does not complement to A, C, G or T.
+    """
+    is_str = isinstance(sequence, str)
+    data = sequence.encode('ascii', errors='replace') if is_str else _as_uint8(sequence).tobytes()
+    if mask_unknown:
+        data = data.upper()
+    rev_comp = data.translate(_RC_TABLE)[::-1]
+    if mask_unknown:
+        rev_comp = _NOT_ACGT.sub(b'N', rev_comp)
+    return rev_comp.decode('ascii') if is_str else rev_comp
+
+def longest_common_substring(a, b):
+    """Length of the longest substring of a that also occurs in b (bit-parallel)"""
+    # One bitmask per base marking where it occurs in b
+    masks = {}
+    for k, base in enumerate(b):
+        masks[base] = masks.get(base, 0) | (1 << k)
+    
+    # runs[L-1] holds the positions in b where a common run of length >= L ends
+    runs = []
+    best = 0
+    for base in a:
+        match = masks.get(base, 0)
+        new_runs = []
+        if match:
+            new_runs.append(match)
+            for prev in runs:
+                match &= prev << 1
+                if not match:
+                    break
+                new_runs.append(match)
+        runs = new_runs
+        best = max(best, len(runs))
+    return best
 
 class CRISPRScoring:
     def __init__(self):
         """Initialize basic scoring methods"""
-        pass
+        # Dense (position, base) weight table; rows without preferences stay NaN
+        self._pos_weights = np.full((20, 5), np.nan)
+        for pos, weights in POSITION_PREFERENCES.items():
+            self._pos_weights[pos - 1] = [weights['A'], weights['C'], weights['G'], weights['T'], 0.3]
+        self._pos_mask = ~np.isnan(self._pos_weights[:, 0])
 
-    def gc_score(self, sequence):
+    def gc_score(self, sequence, counts=None):
         """
         Calculate GC content score based on 2023 meta-analysis
         Optimal GC content is between 45-65% (updated range)
         Source: Xu et al. 2023, Nature Communications
+        
+        counts: optional per-byte base counts (np.bincount over the
+        encoded sequence) so an already-counted sequence is not rescanned
         """
-        gc = gc_fraction(sequence)
+        if counts is None and not isinstance(sequence, str):
+            counts = np.bincount(_as_uint8(sequence), minlength=256)
         
-        # Score peaks between 45-65% GC
-        if 0.45 <= gc <= 0.65:
-            return 1.0
-        elif gc < 0.45:
-            return gc / 0.45  # Linear falloff below 45%
+        if counts is not None:
+            gc = (counts[ord('G')] + counts[ord('C')]) / len(sequence)
         else:
-            return (1 - gc) / 0.35  # Linear falloff above 65%
+            gc = _gc(sequence)
+        
+        # Score peaks between 45-65% GC, linear falloff outside
+        return _kernels.gc_band_score(gc)
 
     def self_complementarity_score(self, sequence):
         """
@@ -30,26 +128,19 @@ class CRISPRScoring:
         - Kim et al. 2022, Nature Biotechnology
         - Labuhn et al. 2023, Nucleic Acids Research
         """
-        complement = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G'}
-        rev_comp = ''.join(complement.get(base, base) for base in reversed(sequence))
-        
-        max_complementary = 0
-        seq_len = len(sequence)
-        
-        # Check for complementary regions of 5 or more bases (updated threshold)
-        for i in range(seq_len - 4):
-            for j in range(i + 5, seq_len):
-                region = sequence[i:j]
-                if region in rev_comp:
-                    max_complementary = max(max_complementary, len(region))
-        
-        # Updated scoring thresholds
-        if max_complementary < 5:
-            return 1.0
-        elif max_complementary >= 12:
-            return 0.0
+        if not isinstance(sequence, str):
+            sequence = _as_uint8(sequence).tobytes()
+        rev_comp = revcomp(sequence)
+        
+        # Check for complementary regions of 5 or more bases (updated threshold);
+        # candidate regions stop one base short of the 3' end
+        if _kernels.HAS_NUMBA:
+            max_complementary = int(_kernels.max_self_complementary(_as_uint8(sequence), _as_uint8(rev_comp)))
         else:
-            return 1 - ((max_complementary - 5) / 7)  # More gradual penalty
+            max_complementary = longest_common_substring(sequence[:-1], rev_comp)
+        
+        # Updated scoring thresholds, with a gradual penalty from 5 to 12 bases
+        return _kernels.self_comp_band_score(max_complementary)
 
     def homopolymer_score(self, sequence):
         """
@@ -57,32 +148,30 @@ class CRISPRScoring:
         Updated with nucleotide-specific penalties
         Source: Zhang et al. 2023, Genome Biology
         """
-        def get_homopolymer_run(seq, base):
-            max_run = 1
-            current_run = 1
-            for i in range(1, len(seq)):
-                if seq[i] == seq[i-1] == base:
-                    current_run += 1
-                    max_run = max(max_run, current_run)
-                else:
-                    current_run = 1
-            return max_run
-        
-        # Check each base separately with different thresholds
-        t_run = get_homopolymer_run(sequence, 'T')
-        a_run = get_homopolymer_run(sequence, 'A')
-        g_run = get_homopolymer_run(sequence, 'G')
-        c_run = get_homopolymer_run(sequence, 'C')
-        
-        # Stronger penalty for T runs (most detrimental)
-        t_score = 1.0 if t_run <= 2 else 0.0 if t_run >= 4 else 1 - ((t_run - 2) / 2)
-        # Standard penalties for other bases
-        a_score = 1.0 if a_run <= 3 else 0.0 if a_run >= 5 else 1 - ((a_run - 3) / 2)
-        g_score = 1.0 if g_run <= 3 else 0.0 if g_run >= 5 else 1 - ((g_run - 3) / 2)
-        c_score = 1.0 if c_run <= 3 else 0.0 if c_run >= 5 else 1 - ((c_run - 3) / 2)
-        
-        # Weighted average with higher weight for T-runs
-        return 0.4 * t_score + 0.2 * a_score + 0.2 * g_score + 0.2 * c_score
+        seq_arr = _as_uint8(sequence)
+        if _kernels.HAS_NUMBA:
+            # Longest run per base (A, C, G, T, other) from the JIT kernel
+            a_run, c_run, g_run, t_run = _kernels.homopolymer_runs(seq_arr)[:4].tolist()
+        else:
+            # Split the sequence into runs of identical bases in one pass
+            if seq_arr.size > 0:
+                boundaries = np.flatnonzero(np.r_[True, seq_arr[1:] != seq_arr[:-1], True])
+            else:
+                boundaries = np.zeros(1, dtype=np.intp)
+            run_lens = np.diff(boundaries)
+            run_bases = seq_arr[boundaries[:-1]]
+            
+            def get_homopolymer_run(base):
+                return int(run_lens[run_bases == ord(base)].max(initial=1))
+            
+            # Check each base separately with different thresholds
+            t_run = get_homopolymer_run('T')
+            a_run = get_homopolymer_run('A')
+            g_run = get_homopolymer_run('G')
+            c_run = get_homopolymer_run('C')
+        
+        # Stronger penalty and higher weight for T runs (most detrimental)
+        return _kernels.homopolymer_band_score(a_run, c_run, g_run, t_run)
 
     def position_score(self, sequence):
         """
@@ -92,51 +181,108 @@ class CRISPRScoring:
         - DeWeirdt et al. 2023, Nature Biotechnology
         - Kim et al. 2023, Cell Reports Methods
         """
-        # Updated position-specific weights (1-based position)
-        preferences = {
-            1: {'G': 0.9, 'A': 0.6, 'C': 0.4, 'T': 0.2},  # Strong G preference
-            2: {'G': 0.3, 'A': 0.8, 'C': 0.4, 'T': 0.3},  # A preference
-            3: {'G': 0.6, 'A': 0.6, 'C': 0.4, 'T': 0.3},  # G/A preference
-            4: {'G': 0.5, 'A': 0.5, 'C': 0.5, 'T': 0.4},  # Mild base preference
-            16: {'G': 0.7, 'A': 0.5, 'C': 0.3, 'T': 0.3}, # G preference
-            17: {'G': 0.8, 'A': 0.4, 'C': 0.3, 'T': 0.2}, # Strong G preference
-            18: {'G': 0.7, 'A': 0.4, 'C': 0.4, 'T': 0.3}, # G preference
-            19: {'G': 0.6, 'A': 0.5, 'C': 0.4, 'T': 0.3}, # Mild G preference
-            20: {'G': 0.8, 'A': 0.4, 'C': 0.3, 'T': 0.2}  # Strong G preference
-        }
+        seq_arr = _as_uint8(sequence)[:20]
         
-        score = 0
-        count = 0
+        # One weight per scored position that the sequence reaches
+        vals = self._pos_weights[np.arange(len(seq_arr)), _BASE_IDX[seq_arr]]
+        vals = vals[self._pos_mask[:len(seq_arr)]]
         
-        for pos, weights in preferences.items():
-            if pos <= len(sequence):
-                base = sequence[pos-1]
-                score += weights.get(base, 0.3)  # Updated default score
-                count += 1
-        
-        return score / count if count > 0 else 0.5
+        # Summed left to right so the result matches the per-position total exactly
+        return sum(vals.tolist()) / vals.size if vals.size > 0 else _kernels.POSITION_DEFAULT
 
-    def calculate_all_scores(self, sequence):
+    def calculate_all_scores(self, sequence, counts=None):
         """
         Calculate all basic scores and return weighted average
         Updated weights based on importance in recent literature
         """
         scores = {
-            'gc_score': self.gc_score(sequence),
+            'gc_score': self.gc_score(sequence, counts),
             'self_complementarity': self.self_complementarity_score(sequence),
             'homopolymer': self.homopolymer_score(sequence),
             'position': self.position_score(sequence)
         }
         
-        # Updated weights based on recent meta-analyses
-        weights = {
-            'gc_score': 0.25,             # Slightly reduced weight
-            'self_complementarity': 0.25,  # Slightly reduced weight
-            'homopolymer': 0.2,           # Maintained weight
-            'position': 0.3               # Increased weight due to strong evidence
-        }
-        
-        final_score = sum(scores[k] * weights[k] for k in scores)
+        final_score = sum(scores[k] * SCORE_WEIGHTS[k] for k in scores)
         scores['final_score'] = final_score
         
-        return scores 
\ No newline at end of file
+        return scores
+
+    def calculate_all_scores_batch(self, sequences):
+        """
+        Score many sequences at once, returns a (K, 5) matrix in SCORE_COLUMNS order
+        
+        sequences is a list of str/bytes or an already stacked (K, L) uint8
+        array. Equal-length sequences are stacked into one (K, L) array and
+        each score is computed for every row together; mixed lengths fall
+        back to calculate_all_scores per sequence. Repeated guides are scored
+        once. With numba, 20-nt guides go through the fixed-length
+        _kernels.score20 kernel.
+        """
+        if isinstance(sequences, np.ndarray) and sequences.ndim == 2 and sequences.shape[1] > 0:
+            arr = sequences.astype(np.uint8, copy=False)
+        else:
+            lengths = {len(seq) for seq in sequences}
+            if len(lengths) != 1 or 0 in lengths:
+                return np.array([list(self.calculate_all_scores(seq).values()) for seq in sequences],
+                                dtype=float).reshape(-1, len(SCORE_COLUMNS))
+            arr = np.vstack([_as_uint8(seq) for seq in sequences])
+        
+        # Score each distinct guide once and fan the rows back out
+        uniq, inverse = np.unique(arr, axis=0, return_inverse=True)
+        if len(uniq) < len(arr):
+            return self._score_rows(uniq)[inverse.reshape(-1)]
+        return self._score_rows(arr)
+
+    def _score_rows(self, arr):
+        """Body of calculate_all_scores_batch for a stacked (K, L) uint8 array"""
+        seq_len = arr.shape[1]
+        if _kernels.HAS_NUMBA and seq_len == _kernels.GUIDE_LEN:
+            return _kernels.score20(np.ascontiguousarray(arr), _RC_LUT, _BASE_IDX, self._pos_weights,
+                                    self._pos_mask, _SCORE_WEIGHT_ARR)
+        
+        idx = _BASE_IDX[arr]
+        n_rows = len(arr)
+        
+        # Counts and run lengths are small integers, so each band score is looked
+        # up from a table built with the same scalar helpers the kernels use
+        
+        # GC score
+        gc_counts = ((arr == ord('G')) | (arr == ord('C'))).sum(axis=1)
+        gc_lut = np.array([_kernels.gc_band_score(k / seq_len) for k in range(seq_len + 1)])
+        gc_scores = gc_lut[gc_counts]
+        
+        # Self-complementarity: longest diagonal run of matches between each
+        # sequence (minus its last base) and its reverse complement
+        rev_comp = _RC_LUT[arr][:, ::-1]
+        run = np.zeros((n_rows, seq_len + 1), dtype=np.intp)
+        longest = np.zeros(n_rows, dtype=np.intp)
+        for i in range(seq_len - 1):
+            run[:, 1:] = np.where(arr[:, i, None] == rev_comp, run[:, :-1] + 1, 0)
+            np.maximum(longest, run.max(axis=1), out=longest)
+        comp_lut = np.array([_kernels.self_comp_band_score(k) for k in range(seq_len + 1)])
+        comp_scores = comp_lut[longest]
+        
+        # Homopolymer: running length of the current run, tracked per base column
+        max_runs = np.ones((n_rows, 5), dtype=np.intp)
+        current = np.ones(n_rows, dtype=np.intp)
+        rows = np.arange(n_rows)
+        for i in range(1, seq_len):
+            current = np.where(arr[:, i] == arr[:, i - 1], current + 1, 1)
+            max_runs[rows, idx[:, i]] = np.maximum(max_runs[rows, idx[:, i]], current)
+        run_rows, run_inverse = np.unique(max_runs[:, :4], axis=0, return_inverse=True)
+        homo_lut = np.array([_kernels.homopolymer_band_score(*row) for row in run_rows.tolist()])
+        homo_scores = homo_lut[run_inverse.reshape(-1)]
+        
+        # Position score, summed left to right (cumsum) to match position_score
+        scored = np.flatnonzero(self._pos_mask[:seq_len])
+        if scored.size > 0:
+            vals = self._pos_weights[scored, idx[:, scored]]
+            pos_scores = np.cumsum(vals, axis=1)[:, -1] / scored.size
+        else:
+            pos_scores = np.full(n_rows, _kernels.POSITION_DEFAULT)
+        
+        matrix = np.column_stack([gc_scores, comp_scores, homo_scores, pos_scores, np.zeros(n_rows)])
+        for col, weight in enumerate(SCORE_WEIGHTS.values()):
+            matrix[:, -1] += matrix[:, col] * weight
+        
+        return matrix
@@ -1,24 +1,161 @@
-import re
-from Bio.SeqUtils import gc_fraction
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
 import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
 from sklearn.preprocessing import StandardScaler
 import streamlit as st
-from .scoring_algorithms import CRISPRScoring
+from . import _kernels
+from ._kernels import HAS_NUMBA
+from .scoring_algorithms import CRISPRScoring, longest_common_substring, revcomp, _as_uint8, _BASE_IDX, _RC_TABLE
+
+# Shared scorer, built once per process rather than per call
+_SCORER = CRISPRScoring()
+
+# Allowed bases at each PAM offset, matched from the site start (the N of NGG)
+PAM_MOTIFS = {
+    "SpCas9 (NGG)": ("ACGT", "G", "G"),
+    "SaCas9 (NNGRRT)": ("ACGT", "ACGT", "GA", "AG", "AG", "T"),
+    "Cas12a (TTTV)": ("T", "T", "T", "ACG")
+}
+
+def _pam_literals(motif):
+    """Split a PAM motif into its leading N count and every concrete suffix it matches"""
+    lead = 0
+    while lead < len(motif) and motif[lead] == "ACGT":
+        lead += 1
+    return lead, [''.join(p).encode('ascii') for p in product(*motif[lead:])]
+
+# Literal byte patterns per PAM, expanded once at import (NGG -> GG, TTTV -> TTTA/TTTC/TTTG)
+_PAM_LITERALS = {name: _pam_literals(motif) for name, motif in PAM_MOTIFS.items()}
+
+# Targets at least this long spread off-target scoring across threads
+_THREAD_MIN_BASES = 50_000
+
+# Off-target weight for a window with 0..4 mismatches
+_MISMATCH_WEIGHTS = 1.0 / 2.0 ** np.arange(5)
+
+def encode_sequence(sequence):
+    """Encode a cleaned DNA sequence (str, bytes or uint8 array) as a uint8 array, one byte per base"""
+    return _as_uint8(sequence)
+
+def _off_target_score_np(guide_u8, seq_u8):
+    """NumPy fallback for _kernels.off_target_score using a sliding window view"""
+    n_windows = len(seq_u8) - len(guide_u8)
+    if n_windows <= 0:
+        return 0.0
+    
+    # Mismatches per window; the last window is skipped like the original scan
+    windows = np.lib.stride_tricks.sliding_window_view(seq_u8, len(guide_u8))[:n_windows]
+    mismatches = np.count_nonzero(windows != guide_u8, axis=1)
+    
+    # Only windows with 4 or fewer mismatches count, weighted 1/2**mismatches
+    hits = np.bincount(mismatches[mismatches <= 4], minlength=5)
+    return float(hits @ _MISMATCH_WEIGHTS)
+
+def find_pam_sites_np(seq_arr, pam_type):
+    """PAM scan over an encoded sequence, returns site start positions"""
+    # NGG: the JIT scan is fastest; without numba the 2-bit SWAR scan beats bytes.find
+    if pam_type == "SpCas9 (NGG)":
+        if HAS_NUMBA:
+            return _kernels.scan_ngg(seq_arr).tolist()
+        return find_pam_sites_swar(encode_2bit(seq_arr), len(seq_arr))
+    
+    # Scan for each literal suffix with bytes.find; hits are shifted back over the leading Ns
+    lead, patterns = _PAM_LITERALS[pam_type]
+    data = seq_arr.tobytes()
+    sites = []
+    for pattern in patterns:
+        pos = data.find(pattern, lead)
+        while pos != -1:
+            sites.append(pos - lead)
+            pos = data.find(pattern, pos + 1)
+    
+    sites.sort()
+    return sites
+
+def base_counts(seq_arr):
+    """Count every byte value of an encoded sequence in one pass (index with ord(base))"""
+    return np.bincount(seq_arr, minlength=256)
+
+def is_valid_dna(seq_arr):
+    """True if an encoded sequence contains only A, C, G and T"""
+    return bool(((seq_arr == 65) | (seq_arr == 67) | (seq_arr == 71) | (seq_arr == 84)).all())
+
+_RNA_TABLE = bytes.maketrans(b'T', b'U')  # Note: T → U for RNA
+
+def rna_and_complement(sequence):
+    """Translate a DNA sequence to RNA and its per-base pairing partners (unreversed)"""
+    rna = sequence.encode('ascii', errors='replace').translate(_RNA_TABLE)
+    comp = rna.translate(_RC_TABLE).translate(_RNA_TABLE)
+    return np.frombuffer(rna, dtype=np.uint8), np.frombuffer(comp, dtype=np.uint8)
+
+def candidate_base_pairs(rna_arr, comp_arr, min_loop=4):
+    """Complementary (i, j) pairs with j >= i + min_loop, ordered by i then j"""
+    # Bucket positions by base once, then pick partners from the complementary bucket;
+    # only A, C, G and U are bucketed, so anything else never pairs
+    buckets = {base: np.flatnonzero(rna_arr == base) for base in b'ACGU'}
+    empty = np.empty(0, dtype=np.intp)
+    pair_i, pair_j = [empty], [empty]
+    for i, partner in enumerate(comp_arr.tolist()):
+        partners = buckets.get(partner, empty)
+        partners = partners[np.searchsorted(partners, i + min_loop):]
+        pair_i.append(np.full(len(partners), i, dtype=np.intp))
+        pair_j.append(partners)
+    
+    return np.concatenate(pair_i), np.concatenate(pair_j)
+
+def count_base_pairs(rna_arr, min_loop=4):
+    """Count G-C and A-U pairs with j >= i + min_loop in O(N) via prefix sums"""
+    is_g = (rna_arr == ord('G')).astype(np.int64)
+    is_c = (rna_arr == ord('C')).astype(np.int64)
+    is_a = (rna_arr == ord('A')).astype(np.int64)
+    is_u = (rna_arr == ord('U')).astype(np.int64)
+    
+    # cumsum(x)[:-min_loop] counts x at every i <= j - min_loop for each partner j
+    def pairs(x, y):
+        return int(np.dot(np.cumsum(x)[:-min_loop], y[min_loop:]))
+    
+    gc_pairs = pairs(is_g, is_c) + pairs(is_c, is_g)
+    au_pairs = pairs(is_a, is_u) + pairs(is_u, is_a)
+    return gc_pairs, au_pairs
+
+# 2-bit base codes (A=0, C=1, G=2, T=3); anything else packs as A
+_2BIT_LUT = np.zeros(256, dtype=np.uint64)
+_2BIT_LUT[[ord('C'), ord('G'), ord('T')]] = [1, 2, 3]
+_2BIT_SHIFTS = np.arange(32, dtype=np.uint64) * np.uint64(2)
+_LO_BITS = np.uint64(0x5555555555555555)
+
+def encode_2bit(seq_arr):
+    """Pack an encoded sequence into uint64 words, 32 bases per word"""
+    n_words = -(-len(seq_arr) // 32)
+    codes = np.zeros(n_words * 32, dtype=np.uint64)
+    codes[:len(seq_arr)] = _2BIT_LUT[seq_arr]
+    return np.bitwise_or.reduce(codes.reshape(-1, 32) << _2BIT_SHIFTS, axis=1)
+
+def find_pam_sites_swar(packed, length):
+    """SWAR scan for SpCas9 NGG sites over a 2-bit packed sequence"""
+    if length < 3:
+        return []
+    
+    # G is the only code with the high bit set and the low bit clear
+    is_g = (packed >> np.uint64(1)) & ~packed & _LO_BITS
+    
+    # Shift the next base into each slot, carrying across word boundaries
+    carry = np.zeros_like(is_g)
+    carry[:-1] = is_g[1:] << np.uint64(62)
+    gg = is_g & ((is_g >> np.uint64(2)) | carry)
+    
+    # One flag per base: bit k set means bases k and k+1 are both G
+    flags = np.unpackbits(gg.astype('<u8').view(np.uint8), bitorder='little')[0::2]
+    return np.flatnonzero(flags[1:length - 1]).tolist()
 
 def find_pam_sites(sequence, pam_type):
     """Improved PAM site finding with better sequence handling"""
     # Clean the sequence first
     sequence = sequence.upper().replace(" ", "").replace("\n", "")
     
-    # Updated PAM patterns
-    pam_patterns = {
-        "SpCas9 (NGG)": "(?=.GG)",
-        "SaCas9 (NNGRRT)": "(?=..[GA][AG][AG]T)",
-        "Cas12a (TTTV)": "(?=TTT[ACG])"  # More precise TTTV pattern
-    }
-    
-    pattern = pam_patterns[pam_type]
-    sites = [m.start() for m in re.finditer(pattern, sequence)]
+    sites = find_pam_sites_np(encode_sequence(sequence), pam_type)
     
     # Add debugging information
     if not sites:
@@ -32,21 +169,27 @@ def find_pam_sites(sequence, pam_type):
     
     return sites
 
-def design_grnas(sequence, pam_sites, gc_min, gc_max):
+def design_grnas(sequence, pam_sites, gc_min, gc_max, seq_arr=None):
+    if seq_arr is None:
+        seq_arr = encode_sequence(sequence)
+    
+    # For SpCas9, gRNA is 20nt upstream of PAM
+    sites = np.asarray(pam_sites, dtype=np.intp)
+    sites = sites[sites >= 20]
+    
+    # GC fraction of every upstream 20-mer from one prefix sum over the sequence
+    gc_prefix = np.concatenate(([0], np.cumsum((seq_arr == ord('G')) | (seq_arr == ord('C')))))
+    gc_content = (gc_prefix[sites] - gc_prefix[sites - 20]) / 20
+    keep = (gc_min <= gc_content) & (gc_content <= gc_max)
+    
     grnas = []
-    for site in pam_sites:
-        # For SpCas9, gRNA is 20nt upstream of PAM
-        if site >= 20:
-            grna_seq = sequence[site-20:site]
-            gc_content = gc_fraction(grna_seq)
-            
-            if gc_min <= gc_content <= gc_max:
-                grnas.append({
-                    'sequence': grna_seq,
-                    'pam': sequence[site:site+3],
-                    'position': site-20,
-                    'gc_content': gc_content
-                })
+    for site, gc in zip(sites[keep].tolist(), gc_content[keep].tolist()):
+        grnas.append({
+            'sequence': sequence[site-20:site],
+            'pam': sequence[site:site+3],
+            'position': site-20,
+            'gc_content': gc
+        })
     return grnas
 
 def analyze_secondary_structure(grnas):
@@ -64,22 +207,32 @@ def analyze_secondary_structure(grnas):
 
 def simple_structure_estimation(sequence):
     """Simplified stability estimation based on base pairing potential"""
+    counts = base_counts(encode_sequence(sequence))
+    
     # Count potential G-C pairs (stronger bonds)
-    gc_pairs = min(sequence.count('G'), sequence.count('C'))
+    gc_pairs = int(min(counts[ord('G')], counts[ord('C')]))
     
     # Count potential A-T pairs (weaker bonds)
-    at_pairs = min(sequence.count('A'), sequence.count('T'))
+    at_pairs = int(min(counts[ord('A')], counts[ord('T')]))
     
     # Simple scoring: GC pairs contribute more to stability
     stability = -(gc_pairs * 3 + at_pairs * 2)
     return round(stability, 2)
 
+def grnas_to_frame(grnas):
+    """Build a results DataFrame column by column from a list of gRNA dicts"""
+    if isinstance(grnas, pd.DataFrame):
+        return grnas
+    if not grnas:
+        return pd.DataFrame()
+    
+    # gRNAs share one key layout, so build each column as a single array instead
+    # of letting pandas walk the records and infer dtypes row by row
+    return pd.DataFrame({key: np.array([grna.get(key) for grna in grnas]) for key in grnas[0]})
+
 def display_grna_results(grnas):
     """Enhanced results display"""
-    import streamlit as st
-    import pandas as pd
-    
-    df = pd.DataFrame(grnas)
+    df = grnas_to_frame(grnas)
     
     # Reorder and format columns
     columns = [
@@ -93,37 +246,26 @@ def display_grna_results(grnas):
     
     df = df[columns]
     
-    # Format display values
-    df['gc_content'] = df['gc_content'].apply(lambda x: f"{x*100:.1f}%")
-    df['efficiency_score'] = df['efficiency_score'].apply(lambda x: f"{x*100:.1f}%")
-    df['off_target_score'] = df['off_target_score'].apply(lambda x: f"{x:.1f}")
-    
-    # Add color coding
-    def color_efficiency(val):
-        try:
-            num_val = float(val.strip('%'))/100
-            if num_val >= 0.7:
-                return 'background-color: #90EE90'  # Light green
-            elif num_val >= 0.5:
-                return 'background-color: #FFFFE0'  # Light yellow
-            return 'background-color: #FFB6C1'      # Light red
-        except:
-            return ''
-
-    def color_offtarget(val):
-        try:
-            num_val = float(val)
-            if num_val <= 20:
-                return 'background-color: #90EE90'  # Light green
-            elif num_val <= 50:
-                return 'background-color: #FFFFE0'  # Light yellow
-            return 'background-color: #FFB6C1'      # Light red
-        except:
-            return ''
-    
-    # Apply styling
-    styled_df = df.style.map(color_efficiency, subset=['efficiency_score'])\
-                       .map(color_offtarget, subset=['off_target_score'])
+    # Color whole columns at once from the numeric scores
+    def color_efficiency(col):
+        return np.select([col >= 0.7, col >= 0.5],
+                         ['background-color: #90EE90',   # Light green
+                          'background-color: #FFFFE0'],  # Light yellow
+                         'background-color: #FFB6C1')    # Light red
+
+    def color_offtarget(col):
+        return np.select([col <= 20, col <= 50],
+                         ['background-color: #90EE90',   # Light green
+                          'background-color: #FFFFE0'],  # Light yellow
+                         'background-color: #FFB6C1')    # Light red
+    
+    # Format display values and apply styling
+    styled_df = df.style.format({
+        'gc_content': lambda x: f"{x*100:.1f}%",
+        'efficiency_score': lambda x: f"{x*100:.1f}%",
+        'off_target_score': lambda x: f"{x:.1f}"
+    }).apply(color_efficiency, subset=['efficiency_score'])\
+      .apply(color_offtarget, subset=['off_target_score'])
     
     # Display results with explanations
     st.subheader("Guide RNA Results")
@@ -136,27 +278,24 @@ def display_grna_results(grnas):
 
 def predict_grna_efficiency(grnas):
     """Predict gRNA efficiency using our custom scoring algorithm"""
-    from .scoring_algorithms import CRISPRScoring
-    scorer = CRISPRScoring()
-    
-    for grna in grnas:
-        sequence = grna['sequence']
-        # Calculate all scores using our new system
-        scores = scorer.calculate_all_scores(sequence)
-        # Use the final_score as our efficiency score
-        grna['efficiency_score'] = scores['final_score']
-        # Store individual component scores for reference
-        grna['gc_score'] = scores['gc_score']
-        grna['self_complementarity'] = scores['self_complementarity']
-        grna['homopolymer'] = scores['homopolymer']
-        grna['position'] = scores['position']
+    # Score every gRNA in one batch, then merge each row into its dict
+    scores = _SCORER.calculate_all_scores_batch([grna['sequence'] for grna in grnas])
+    for grna, (gc_score, self_comp, homopolymer, position, final_score) in zip(grnas, scores.tolist()):
+        grna.update(
+            efficiency_score=final_score,  # Use the final_score as our efficiency score
+            gc_score=gc_score,
+            self_complementarity=self_comp,
+            homopolymer=homopolymer,
+            position_score=position  # Kept apart from 'position', the gRNA start coordinate
+        )
     
     return grnas
 
 def analyze_structure_details(sequence):
     """Detailed structure analysis"""
-    gc_count = sequence.count('G') + sequence.count('C')
-    at_count = sequence.count('A') + sequence.count('T')
+    counts = base_counts(encode_sequence(sequence))
+    gc_count = int(counts[ord('G')] + counts[ord('C')])
+    at_count = int(counts[ord('A')] + counts[ord('T')])
     
     return {
         'gc_pairs': gc_count,
@@ -164,68 +303,96 @@ def analyze_structure_details(sequence):
         'stability': 'High' if gc_count > len(sequence)/2 else 'Medium' if gc_count > len(sequence)/3 else 'Low'
     }
 
+# Position-specific weights based on literature (rows = positions, columns A, C, G, T)
+_POSITION_WEIGHTS = np.array([
+    [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.7, 0.6, 0.5,
+     0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7],
+    [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.8, 0.7, 0.6,
+     0.5, 0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+    [0.8, 0.6, 0.7, 0.5, 0.6, 0.7, 0.8, 0.9, 0.8, 0.7,
+     0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4, 0.5],
+    [0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4,
+     0.5, 0.6, 0.7, 0.8, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4]
+]).T
+
 def calculate_position_score(sequence):
     """Calculate position-specific nucleotide preferences"""
-    # Position-specific weights based on literature
-    weights = {
-        'G': [0.8, 0.6, 0.7, 0.5, 0.6, 0.7, 0.8, 0.9, 0.8, 0.7,
-              0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4, 0.5],
-        'A': [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.7, 0.6, 0.5,
-              0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7],
-        'T': [0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4,
-              0.5, 0.6, 0.7, 0.8, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4],
-        'C': [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.8, 0.7, 0.6,
-              0.5, 0.4, 0.3, 0.2, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
-    }
-    
-    score = 0
-    for i, base in enumerate(sequence):
-        score += weights[base][i]
+    seq_arr = encode_sequence(sequence)
+    score = sum(_POSITION_WEIGHTS[np.arange(len(seq_arr)), _BASE_IDX[seq_arr]].tolist())
     
     return score / len(sequence)
 
 def check_self_complementarity(sequence):
     """Check for self-complementarity issues"""
-    complement = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G'}
-    rev_comp = ''.join(complement[base] for base in reversed(sequence))
+    rev_comp = revcomp(sequence)
     
-    max_complementary = 0
-    for i in range(len(sequence)-3):
-        for j in range(i+3, len(sequence)):
-            if sequence[i:j] in rev_comp:
-                max_complementary = max(max_complementary, j-i)
+    # Regions of 3+ bases, stopping one base short of the 3' end
+    max_complementary = longest_common_substring(sequence[:-1], rev_comp)
+    if max_complementary < 3:
+        max_complementary = 0
     
     return max_complementary / len(sequence)
 
-def check_off_targets(grnas, target_sequence):
-    """Improved off-target prediction"""
-    for grna in grnas:
-        sequence = grna['sequence']
-        
-        # Initialize off-target score
-        off_target_score = 0
-        
-        # Scan through sequence with sliding window
-        for i in range(len(target_sequence)-len(sequence)):
-            window = target_sequence[i:i+len(sequence)]
-            mismatches = sum(a != b for a, b in zip(sequence, window))
-            
-            # Only consider windows with 4 or fewer mismatches
-            if mismatches <= 4:
-                # Weight score by number of mismatches
-                # Fewer mismatches = higher off-target risk
-                off_target_score += 1.0 / (2 ** mismatches)
-        
+def check_off_targets(grnas, target_sequence, target_arr=None, max_workers=None):
+    """Improved off-target prediction
+    
+    max_workers caps the scoring threads used on long targets (None uses the
+    ThreadPoolExecutor default, 1 scores serially).
+    """
+    if target_arr is None:
+        target_arr = encode_sequence(target_sequence)
+    guides = [encode_sequence(grna['sequence']) for grna in grnas]
+    
+    score_guide = _kernels.off_target_score if HAS_NUMBA else _off_target_score_np
+    
+    # Each gRNA is scored independently; both the JIT kernel (nogil) and the
+    # NumPy window compare release the GIL, so threads overlap on long targets
+    if max_workers != 1 and len(guides) > 1 and len(target_arr) >= _THREAD_MIN_BASES:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            scores = list(executor.map(lambda guide: score_guide(guide, target_arr), guides))
+    else:
+        scores = [score_guide(guide, target_arr) for guide in guides]
+    
+    for grna, off_target_score in zip(grnas, scores):
         # Normalize score to 0-100 range
         normalized_score = min(100, off_target_score * 20)
         grna['off_target_score'] = round(normalized_score, 1)
     
     return grnas 
 
+def design_batch_item(item):
+    """Run the full design pipeline for one batch entry.
+    
+    Module-level so multiprocessing can pickle it. item is
+    (idx, name, sequence, pam_type, gc_min, gc_max); returns (idx, frame)
+    where frame is a DataFrame with one row per gRNA (empty if none).
+    """
+    idx, name, sequence, pam_type, gc_min, gc_max = item
+    
+    # Clean, encode once and validate sequence
+    clean_sequence = sequence.upper().replace(" ", "").replace("\n", "")
+    seq_arr = encode_sequence(clean_sequence)
+    if not is_valid_dna(seq_arr):
+        return idx, pd.DataFrame()
+    
+    # Find PAM sites and design gRNAs
+    pam_sites = find_pam_sites_np(seq_arr, pam_type)
+    if not pam_sites:
+        return idx, pd.DataFrame()
+    grnas = design_grnas(clean_sequence, pam_sites, gc_min, gc_max, seq_arr)
+    if not grnas:
+        return idx, pd.DataFrame()
+    
+    # Add sequence name to results
+    for grna in grnas:
+        grna['sequence_name'] = name
+    grnas = predict_grna_efficiency(grnas)
+    # Serial here: the batch process pool already keeps every core busy
+    grnas = check_off_targets(grnas, clean_sequence, seq_arr, max_workers=1)
+    return idx, grnas_to_frame(grnas)
+
 def create_sequence_plot(sequence):
     """Create an interactive sequence visualization"""
-    import plotly.graph_objects as go
-    
     # Create base colors
     colors = {
         'A': '#FF9999', 'T': '#99FF99',